@@ -0,0 +1,454 @@
+# shopee_coordinator.py
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from shopee_scraper_engine import DEMO_MAX_PAGES, generate_demo_page
+
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_PAGES_PER_SHARD = 1
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_MAX_RESTARTS = 3
+DEFAULT_TIMEOUT = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_units (
+    unit_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id      TEXT NOT NULL,
+    product_url   TEXT NOT NULL,
+    star_filter   INTEGER NOT NULL,
+    page_start    INTEGER NOT NULL,
+    page_end      INTEGER NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    worker_id     TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    last_error    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_work_units_status ON work_units (batch_id, status);
+CREATE TABLE IF NOT EXISTS shard_results (
+    unit_id     INTEGER PRIMARY KEY REFERENCES work_units (unit_id),
+    worker_id   TEXT NOT NULL,
+    rows_json   TEXT NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+def build_work_units(urls, rating_limits, pages_per_shard=DEFAULT_PAGES_PER_SHARD,
+                     max_pages=DEMO_MAX_PAGES):
+    """Split a batch into (product, star_filter, page-range) work units.
+
+    Pages per star filter are capped at max_pages, the same cap the
+    single-process demo scraper applies. Pass max_pages=None for no cap.
+    """
+    if pages_per_shard < 1:
+        raise ValueError("pages_per_shard must be at least 1")
+
+    units = []
+    for url in urls:
+        for rating in range(1, 6):
+            rating_pages = rating_limits.get(rating, 0)
+            if max_pages is not None:
+                rating_pages = min(rating_pages, max_pages)
+            for page_start in range(1, rating_pages + 1, pages_per_shard):
+                units.append({
+                    'product_url': url,
+                    'star_filter': rating,
+                    'page_start': page_start,
+                    'page_end': min(page_start + pages_per_shard - 1, rating_pages),
+                })
+    return units
+
+
+class ShardCoordinator:
+    """SQLite-backed lease table shared by the coordinator and its workers.
+
+    Every process opens its own connection to the same database file. The
+    database uses WAL mode, so all workers must run on the same host as the
+    file. A leased unit whose lease expires without being renewed or
+    completed is handed to the next worker that asks for work.
+    """
+
+    def __init__(self, db_path, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode so each write transaction is opened explicitly
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _write(self, func, *args):
+        """Run func inside a write-locked transaction"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+            self.conn.execute("COMMIT")
+            return result
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def submit_batch(self, units, batch_id=None):
+        """Queue work units under a new batch and return its id"""
+        batch_id = batch_id or uuid.uuid4().hex
+
+        def insert():
+            self.conn.executemany(
+                "INSERT INTO work_units (batch_id, product_url, star_filter, page_start, page_end) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(batch_id, u['product_url'], u['star_filter'], u['page_start'], u['page_end'])
+                 for u in units]
+            )
+
+        self._write(insert)
+        return batch_id
+
+    def lease_unit(self, batch_id, worker_id):
+        """Lease the next pending or expired unit, or return None when nothing is available"""
+        def lease():
+            now = time.time()
+            # Expired leases that have used up their attempts are given up on
+            self.conn.execute(
+                "UPDATE work_units SET status = 'failed', worker_id = NULL, lease_expires = NULL, "
+                "last_error = COALESCE(last_error, 'lease expired') "
+                "WHERE batch_id = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (batch_id, now, self.max_attempts)
+            )
+            row = self.conn.execute(
+                "SELECT * FROM work_units WHERE batch_id = ? AND "
+                "(status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY unit_id LIMIT 1",
+                (batch_id, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE work_units SET status = 'leased', worker_id = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE unit_id = ?",
+                (worker_id, now + self.lease_seconds, row['unit_id'])
+            )
+            unit = dict(row)
+            unit['attempts'] += 1
+            return unit
+
+        return self._write(lease)
+
+    def renew_lease(self, unit_id, worker_id):
+        """Extend a lease; returns False if the unit was reassigned to another worker"""
+        def renew():
+            cursor = self.conn.execute(
+                "UPDATE work_units SET lease_expires = ? "
+                "WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, unit_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+        return self._write(renew)
+
+    def complete_unit(self, unit_id, worker_id, rows):
+        """Store a unit's rows; results from a worker that lost its lease are dropped"""
+        def complete():
+            cursor = self.conn.execute(
+                "UPDATE work_units SET status = 'done', lease_expires = NULL "
+                "WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+                (unit_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                return False
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shard_results (unit_id, worker_id, rows_json, finished_at) "
+                "VALUES (?, ?, ?, ?)",
+                (unit_id, worker_id, json.dumps(rows), time.time())
+            )
+            return True
+
+        return self._write(complete)
+
+    def fail_unit(self, unit_id, worker_id, error):
+        """Release a unit after an error so it can be retried, or mark it failed"""
+        def fail():
+            row = self.conn.execute(
+                "SELECT attempts FROM work_units WHERE unit_id = ? AND worker_id = ? AND status = 'leased'",
+                (unit_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return
+            status = 'failed' if row['attempts'] >= self.max_attempts else 'pending'
+            self.conn.execute(
+                "UPDATE work_units SET status = ?, worker_id = NULL, lease_expires = NULL, last_error = ? "
+                "WHERE unit_id = ?",
+                (status, str(error), unit_id)
+            )
+
+        self._write(fail)
+
+    def batch_status(self, batch_id):
+        """Count the batch's units by status"""
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        for row in self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM work_units WHERE batch_id = ? GROUP BY status",
+            (batch_id,)
+        ):
+            counts[row['status']] = row['n']
+        return counts
+
+    def failed_units(self, batch_id):
+        return [dict(row) for row in self.conn.execute(
+            "SELECT * FROM work_units WHERE batch_id = ? AND status = 'failed' ORDER BY unit_id",
+            (batch_id,)
+        )]
+
+    def merge_results(self, batch_id):
+        """Merge shard outputs into one DataFrame in the order the units were built"""
+        rows = []
+        for row in self.conn.execute(
+            "SELECT r.rows_json FROM shard_results r JOIN work_units u ON u.unit_id = r.unit_id "
+            "WHERE u.batch_id = ? AND u.status = 'done' ORDER BY u.unit_id",
+            (batch_id,)
+        ):
+            rows.extend(json.loads(row['rows_json']))
+        return pd.DataFrame(rows) if rows else None
+
+    def delete_batch(self, batch_id):
+        """Remove a batch's units and stored results"""
+        def delete():
+            self.conn.execute(
+                "DELETE FROM shard_results WHERE unit_id IN "
+                "(SELECT unit_id FROM work_units WHERE batch_id = ?)",
+                (batch_id,)
+            )
+            self.conn.execute("DELETE FROM work_units WHERE batch_id = ?", (batch_id,))
+
+        self._write(delete)
+
+
+class LeaseHeartbeat(threading.Thread):
+    """Renews a unit's lease in the background while the worker scrapes it.
+
+    Uses its own connection because SQLite connections can't be shared
+    between threads. Sets lost when the lease has been reassigned.
+    """
+
+    def __init__(self, db_path, unit_id, worker_id, lease_seconds):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.unit_id = unit_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        coordinator = ShardCoordinator(self.db_path, lease_seconds=self.lease_seconds)
+        try:
+            while not self._stopped.wait(self.lease_seconds / 3):
+                if not coordinator.renew_lease(self.unit_id, self.worker_id):
+                    self.lost.set()
+                    break
+        finally:
+            coordinator.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def scrape_work_unit(unit, lease_lost=None):
+    """Scrape the pages of one work unit and return its review rows.
+
+    Returns None if lease_lost is set between pages, since another worker
+    now owns the unit.
+    """
+    rows = []
+    for page in range(unit['page_start'], unit['page_end'] + 1):
+        if lease_lost is not None and lease_lost.is_set():
+            return None
+        for review in generate_demo_page(unit['star_filter'], page):
+            review['product_url'] = unit['product_url']
+            rows.append(review)
+    return rows
+
+
+def run_worker(db_path, batch_id, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, idle_timeout=0):
+    """Lease and scrape units until the batch has no work left, return units completed"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    coordinator = ShardCoordinator(db_path, lease_seconds=lease_seconds)
+    completed = 0
+    idle_since = None
+    try:
+        while True:
+            unit = coordinator.lease_unit(batch_id, worker_id)
+            if unit is None:
+                # Other workers may still hold leases that could expire back to us
+                status = coordinator.batch_status(batch_id)
+                if status['leased'] == 0:
+                    break
+                idle_since = idle_since or time.time()
+                if idle_timeout and time.time() - idle_since > idle_timeout:
+                    break
+                time.sleep(min(1, lease_seconds / 2))
+                continue
+
+            idle_since = None
+            heartbeat = LeaseHeartbeat(db_path, unit['unit_id'], worker_id, lease_seconds)
+            heartbeat.start()
+            try:
+                rows = scrape_work_unit(unit, lease_lost=heartbeat.lost)
+            except Exception as e:
+                heartbeat.stop()
+                coordinator.fail_unit(unit['unit_id'], worker_id, e)
+                continue
+            heartbeat.stop()
+            if rows is not None and coordinator.complete_unit(unit['unit_id'], worker_id, rows):
+                completed += 1
+    finally:
+        coordinator.close()
+    return completed
+
+
+def _worker_process(db_path, batch_id, worker_id, lease_seconds):
+    run_worker(db_path, batch_id, worker_id, lease_seconds)
+
+
+def run_sharded_scraper(urls, rating_limits, progress_queue, num_workers=None, db_path=None,
+                        pages_per_shard=DEFAULT_PAGES_PER_SHARD, lease_seconds=DEFAULT_LEASE_SECONDS,
+                        max_restarts=DEFAULT_MAX_RESTARTS, timeout=DEFAULT_TIMEOUT):
+    """
+    Split a batch of products into shards, scrape them with local worker
+    processes and merge the results. Reports to progress_queue the same way
+    as run_scraper_for_streamlit.
+
+    Without db_path the lease table lives in a temporary database that is
+    removed afterwards. Crashed workers are restarted at most max_restarts
+    times in total, and the batch fails if it hasn't finished after timeout
+    seconds.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    num_workers = num_workers or max(1, min(os.cpu_count() or 1, 4))
+    temp_dir = None
+    if db_path is None:
+        temp_dir = tempfile.mkdtemp(prefix="shopee_shards_")
+        db_path = os.path.join(temp_dir, "shards.db")
+    coordinator = None
+    batch_id = None
+    workers = []
+
+    try:
+        coordinator = ShardCoordinator(db_path, lease_seconds=lease_seconds)
+        units = build_work_units(urls, rating_limits, pages_per_shard)
+        if not units:
+            progress_queue.put(("error", "❌ No pages selected to scrape", None))
+            return None
+
+        batch_id = coordinator.submit_batch(units)
+        progress_queue.put(("progress", f"🧩 Split {len(urls)} product(s) into {len(units)} shards (batch {batch_id})", 0.1))
+
+        def spawn(index):
+            process = multiprocessing.Process(
+                target=_worker_process,
+                args=(db_path, batch_id, f"{socket.gethostname()}-worker{index}-{uuid.uuid4().hex[:6]}",
+                      lease_seconds),
+                daemon=True
+            )
+            process.start()
+            return process
+
+        workers = [spawn(i) for i in range(num_workers)]
+        progress_queue.put(("progress", f"🚀 Started {num_workers} workers", 0.15))
+
+        deadline = time.time() + timeout
+        restarts = 0
+        last_done = -1
+        while True:
+            status = coordinator.batch_status(batch_id)
+            finished = status['done'] + status['failed']
+            if finished != last_done:
+                last_done = finished
+                progress_queue.put((
+                    "progress",
+                    f"📄 {status['done']}/{len(units)} shards done ({status['leased']} in progress)",
+                    0.15 + (finished / len(units)) * 0.7
+                ))
+            if finished == len(units):
+                break
+
+            if time.time() > deadline:
+                progress_queue.put(("error", f"❌ Sharded scrape timed out after {timeout}s", None))
+                return None
+
+            # Restart crashed workers; their leases expire and are picked up again
+            for i, process in enumerate(workers):
+                if process is None or process.is_alive() or process.exitcode == 0:
+                    continue
+                if restarts >= max_restarts:
+                    progress_queue.put(("error", f"❌ Workers crashed {restarts + 1} times, giving up", None))
+                    return None
+                restarts += 1
+                progress_queue.put(("warning", f"⚠️ Worker {i} exited with code {process.exitcode}, restarting", None))
+                workers[i] = spawn(i)
+
+            # Workers that exited cleanly may have left before a released unit came back
+            if not any(process.is_alive() for process in workers):
+                workers[0] = spawn(0)
+            time.sleep(min(1, lease_seconds / 2))
+
+        failed = coordinator.failed_units(batch_id)
+        if failed:
+            progress_queue.put(("warning", f"⚠️ {len(failed)} shards failed after {coordinator.max_attempts} attempts", None))
+
+        progress_queue.put(("progress", "📊 Merging shard results...", 0.9))
+        df = coordinator.merge_results(batch_id)
+
+        if df is not None:
+            progress_queue.put(("data", "📈 Sharded data ready!", df))
+            progress_queue.put(("complete", f"🎉 Scraped {len(df)} reviews from {status['done']} shards!", None))
+            return df
+        else:
+            progress_queue.put(("error", "❌ No data scraped", None))
+            return None
+
+    except Exception as e:
+        progress_queue.put(("error", f"❌ Sharded scraper error: {str(e)}", None))
+        return None
+    finally:
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
+        if coordinator:
+            if batch_id:
+                coordinator.delete_batch(batch_id)
+            coordinator.close()
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # Standalone worker joining a batch whose lease database is on this host
+    parser = argparse.ArgumentParser(description="Run a Shopee scraper shard worker")
+    parser.add_argument("batch_id")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--worker-id")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS)
+    args = parser.parse_args()
+
+    done = run_worker(args.db, args.batch_id, args.worker_id, args.lease_seconds)
+    print(f"[SUCCESS] Worker finished {done} shards")
@@ -11,6 +11,8 @@ from bs4 import BeautifulSoup
 import re
 from datetime import datetime
 
+DEMO_MAX_PAGES = 2  # Page cap per star filter in demo mode
+
 class ShopeeReviewScraper:
     def __init__(self, progress_queue=None, headless=False, scroll_delay=2):
         self.progress_queue = progress_queue
@@ -46,6 +48,20 @@ class ShopeeReviewScraper:
             self.log_progress("error", f"❌ Failed to initialize browser: {str(e)}")
             return False
 
+def generate_demo_page(rating, page):
+    """Generate the demo reviews for one page of one star filter"""
+    # Generate 3-5 demo reviews per page
+    reviews = []
+    for review_num in range(1, 4):  # 3 reviews per page
+        reviews.append({
+            'star_filter': rating,
+            'actual_rating': rating,
+            'page': page,
+            'date_time': f"2024-{rating:02d}-{page:02d} 1{review_num}:30",
+            'comment': f"Demo review {review_num} for {rating} stars on page {page}. This product meets expectations and delivery was prompt."
+        })
+    return reviews
+
 def run_scraper_for_streamlit(url, rating_limits, progress_queue, headless=False, scroll_speed="Medium"):
     """
     Fast demo function for Streamlit Cloud
@@ -72,20 +88,12 @@ def run_scraper_for_streamlit(url, rating_limits, progress_queue, headless=False
             progress_queue.put(("progress", f"🌟 Generating {rating}-star demo reviews...", base_progress))
             time.sleep(0.5)  # Short delay
             
-            max_pages = min(rating_limits[rating], 2)  # Limit to 2 pages for demo
+            max_pages = min(rating_limits[rating], DEMO_MAX_PAGES)  # Limit pages for demo
             
             for page in range(1, max_pages + 1):
                 progress_queue.put(("progress", f"📄 Demo page {page}/{max_pages} for {rating}⭐", base_progress + 0.1))
                 
-                # Generate 3-5 demo reviews per page
-                for review_num in range(1, 4):  # 3 reviews per page
-                    demo_data.append({
-                        'star_filter': rating,
-                        'actual_rating': rating,
-                        'page': page,
-                        'date_time': f"2024-{rating:02d}-{page:02d} 1{review_num}:30",
-                        'comment': f"Demo review {review_num} for {rating} stars on page {page}. This product meets expectations and delivery was prompt."
-                    })
+                demo_data.extend(generate_demo_page(rating, page))
                 
                 time.sleep(0.3)  # Small delay between pages
         
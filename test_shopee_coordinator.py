@@ -0,0 +1,149 @@
+import multiprocessing
+import queue
+import time
+
+import pytest
+
+import shopee_coordinator
+from shopee_coordinator import ShardCoordinator, build_work_units, run_sharded_scraper, run_worker
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "shards.db")
+
+
+def _lease_and_hang(db_path, batch_id, lease_seconds):
+    coordinator = ShardCoordinator(db_path, lease_seconds=lease_seconds)
+    coordinator.lease_unit(batch_id, "doomed")
+    time.sleep(60)
+
+
+def test_build_work_units_applies_demo_page_cap():
+    units = build_work_units(["u"], {1: 5, 2: 0, 3: 1})
+    assert [(u['star_filter'], u['page_start'], u['page_end']) for u in units] == [(1, 1, 1), (1, 2, 2), (3, 1, 1)]
+
+    units = build_work_units(["u"], {1: 5}, pages_per_shard=2, max_pages=None)
+    assert [(u['page_start'], u['page_end']) for u in units] == [(1, 2), (3, 4), (5, 5)]
+
+
+def test_lease_and_complete(db_path):
+    coordinator = ShardCoordinator(db_path)
+    batch_id = coordinator.submit_batch(build_work_units(["u"], {1: 1}))
+
+    unit = coordinator.lease_unit(batch_id, "w1")
+    assert unit['attempts'] == 1
+    assert coordinator.lease_unit(batch_id, "w2") is None
+    assert coordinator.complete_unit(unit['unit_id'], "w1", [{'comment': "ok"}])
+    assert coordinator.batch_status(batch_id) == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}
+    assert coordinator.merge_results(batch_id)['comment'].tolist() == ["ok"]
+
+
+def test_expired_lease_is_reassigned_and_stale_result_rejected(db_path):
+    coordinator = ShardCoordinator(db_path, lease_seconds=0.2)
+    batch_id = coordinator.submit_batch(build_work_units(["u"], {1: 1}))
+
+    unit = coordinator.lease_unit(batch_id, "w1")
+    time.sleep(0.3)
+    reassigned = coordinator.lease_unit(batch_id, "w2")
+    assert reassigned['unit_id'] == unit['unit_id']
+    assert reassigned['attempts'] == 2
+
+    assert not coordinator.renew_lease(unit['unit_id'], "w1")
+    assert not coordinator.complete_unit(unit['unit_id'], "w1", [{'comment': "stale"}])
+    assert coordinator.complete_unit(unit['unit_id'], "w2", [{'comment': "fresh"}])
+    assert coordinator.merge_results(batch_id)['comment'].tolist() == ["fresh"]
+
+
+def test_unit_fails_after_max_attempts(db_path):
+    coordinator = ShardCoordinator(db_path, lease_seconds=0.1, max_attempts=2)
+    batch_id = coordinator.submit_batch(build_work_units(["u"], {1: 1}))
+
+    unit = coordinator.lease_unit(batch_id, "w1")
+    coordinator.fail_unit(unit['unit_id'], "w1", "boom")
+    coordinator.lease_unit(batch_id, "w2")
+    time.sleep(0.2)
+
+    assert coordinator.lease_unit(batch_id, "w3") is None
+    assert coordinator.batch_status(batch_id)['failed'] == 1
+    assert coordinator.failed_units(batch_id)[0]['last_error'] == "boom"
+
+
+def test_merge_keeps_input_order(db_path):
+    coordinator = ShardCoordinator(db_path)
+    batch_id = coordinator.submit_batch(build_work_units(["https://b", "https://a"], {1: 1, 2: 1}))
+    assert run_worker(db_path, batch_id, "w1") == 4
+
+    df = coordinator.merge_results(batch_id)
+    assert df['product_url'].drop_duplicates().tolist() == ["https://b", "https://a"]
+    assert df.loc[df['product_url'] == "https://b", 'star_filter'].drop_duplicates().tolist() == [1, 2]
+
+
+def test_heartbeat_keeps_slow_unit_leased(db_path, monkeypatch):
+    real_scrape = shopee_coordinator.scrape_work_unit
+
+    def slow_scrape(unit, lease_lost=None):
+        time.sleep(1)
+        return real_scrape(unit, lease_lost)
+
+    monkeypatch.setattr(shopee_coordinator, "scrape_work_unit", slow_scrape)
+    coordinator = ShardCoordinator(db_path, lease_seconds=0.3)
+    batch_id = coordinator.submit_batch(build_work_units(["u"], {1: 1}))
+
+    assert run_worker(db_path, batch_id, "w1", lease_seconds=0.3) == 1
+    assert coordinator.failed_units(batch_id) == []
+    assert len(coordinator.merge_results(batch_id)) == 3
+
+
+def test_workers_recover_units_from_killed_worker(db_path):
+    coordinator = ShardCoordinator(db_path, lease_seconds=0.5)
+    urls = ["https://shopee.sg/a/product/1", "https://shopee.sg/b/product/2"]
+    batch_id = coordinator.submit_batch(build_work_units(urls, {1: 2, 3: 2, 5: 1}))
+
+    doomed = multiprocessing.Process(target=_lease_and_hang, args=(db_path, batch_id, 0.5))
+    doomed.start()
+    while coordinator.batch_status(batch_id)['leased'] == 0:
+        time.sleep(0.05)
+    doomed.kill()
+    doomed.join()
+
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(db_path, batch_id, f"w{i}", 0.5))
+        for i in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    assert coordinator.batch_status(batch_id) == {'pending': 0, 'leased': 0, 'done': 10, 'failed': 0}
+    assert len(coordinator.merge_results(batch_id)) == 30
+
+
+def test_run_sharded_scraper_with_local_workers():
+    progress = queue.Queue()
+    df = run_sharded_scraper(["https://b", "https://a"], {1: 2, 4: 1}, progress, num_workers=3, lease_seconds=1)
+
+    assert len(df) == 18
+    assert df['product_url'].drop_duplicates().tolist() == ["https://b", "https://a"]
+    messages = [progress.get()[0] for _ in range(progress.qsize())]
+    assert messages[-2:] == ["data", "complete"]
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="workers must inherit the patched run_worker")
+def test_run_sharded_scraper_gives_up_on_crashing_workers(monkeypatch):
+    def crash(*args):
+        raise RuntimeError("chrome failed to start")
+
+    monkeypatch.setattr(shopee_coordinator, "run_worker", crash)
+    progress = queue.Queue()
+    start = time.time()
+    df = run_sharded_scraper(["u"], {1: 1}, progress, num_workers=2, lease_seconds=0.5, max_restarts=2)
+
+    assert df is None
+    assert time.time() - start < 20
+    messages = [progress.get() for _ in range(progress.qsize())]
+    assert [m[0] for m in messages].count("warning") == 2
+    assert messages[-1][0] == "error"